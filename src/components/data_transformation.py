@@ -74,25 +74,35 @@ class DataTransformation:
     def _map_gender_column(self, df):
         """Map Gender column to 0 for Female and 1 for Male."""
         logging.info("Mapping 'Gender' column to binary values")
-        df['Gender'] = df['Gender'].map({'Female': 0, 'Male': 1}).astype(int)
+        gender = df['Gender'].to_numpy()
+        unexpected = ~np.isin(gender, ['Female', 'Male'])
+        if unexpected.any():
+            raise ValueError(f"Unexpected 'Gender' values: {pd.unique(gender[unexpected])[:5].tolist()}")
+        df['Gender'] = (gender == 'Male').astype(np.int8)
         return df
 
     def _create_dummy_columns(self, df):
         """Create dummy variables for categorical features."""
         logging.info("Creating dummy variables for categorical features")
-        df = pd.get_dummies(df, drop_first=True)
+        # Known categories let get_dummies skip value discovery; the first one is dropped
+        for col, categories in (('Vehicle_Age', ['1-2 Year', '< 1 Year', '> 2 Years']),
+                                ('Vehicle_Damage', ['No', 'Yes'])):
+            encoded = pd.Categorical(df[col], categories=categories)
+            # Values outside the categories become NaN; don't let them pass as all-zero dummies
+            unexpected = encoded.isna() & df[col].notna().to_numpy()
+            if unexpected.any():
+                raise ValueError(f"Unexpected '{col}' values: {df[col][unexpected].unique()[:5].tolist()}")
+            df[col] = encoded
+        df = pd.get_dummies(df, columns=['Vehicle_Age', 'Vehicle_Damage'], drop_first=True, dtype=np.int8)
         return df
 
     def _rename_columns(self, df):
-        """Rename specific columns and ensure integer types for dummy columns."""
-        logging.info("Renaming specific columns and casting to int")
+        """Rename the Vehicle_Age dummy columns to identifier-friendly names."""
+        logging.info("Renaming specific columns")
         df = df.rename(columns={
             "Vehicle_Age_< 1 Year": "Vehicle_Age_lt_1_Year",
             "Vehicle_Age_> 2 Years": "Vehicle_Age_gt_2_Years"
         })
-        for col in ["Vehicle_Age_lt_1_Year", "Vehicle_Age_gt_2_Years", "Vehicle_Damage_Yes"]:
-            if col in df.columns:
-                df[col] = df[col].astype('int')
         return df
 
     def _drop_id_column(self, df):
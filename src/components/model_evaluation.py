@@ -1,20 +1,42 @@
 # This approch for using local file system
 
 from src.entity.config_entity import ModelEvaluationConfig
-from sklearn.metrics import f1_score, precision_score, recall_score, accuracy_score
 from src.entity.artifact_entity import ModelTrainerArtifact, DataIngestionArtifact, ModelEvaluationArtifact
-from sklearn.metrics import f1_score
 from src.exception import MyException
 from src.constants import TARGET_COLUMN
 from src.logger import logging
-from src.utils.main_utils import load_object, save_object
+from src.utils.main_utils import load_object
 import sys
+import numpy as np
 import pandas as pd
-from typing import Optional
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import sklearn
+from sklearn.utils.parallel import Parallel, delayed
+from typing import Callable, Iterator, Optional, Tuple
 from dataclasses import dataclass
 import os
 import yaml
 import shutil
+import hashlib
+import functools
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import treelite
+    import tl2cgen
+except ImportError:  # optional: compiled tree-ensemble inference
+    treelite = tl2cgen = None
+
+try:
+    import torch
+    from hummingbird.ml import convert as hb_convert
+except ImportError:  # optional: GPU tree-ensemble inference
+    torch = hb_convert = None
 
 @dataclass
 class EvaluateModelResponse:
@@ -29,6 +51,230 @@ class EvaluateModelResponse:
    is_model_accepted: bool
    difference: float
 
+
+# (f1, precision, recall, accuracy) the trained model must beat when no best model exists yet
+_DEFAULT_BEST_METRICS = (0.4358042535618418, 0.2874067214989923, 0.9010416666666666, 0.7132181615902937)
+# Numeric columns passed through unchanged, in the order they appear in the ingested csv
+_PASSTHROUGH_FEATURES = ['Age', 'Driving_License', 'Region_Code', 'Previously_Insured',
+                         'Annual_Premium', 'Policy_Sales_Channel', 'Vintage']
+# Column layout produced at training time (see DataTransformation): Gender first, dummies last
+_FEATURE_COLUMNS = ['Gender', *_PASSTHROUGH_FEATURES,
+                    'Vehicle_Age_lt_1_Year', 'Vehicle_Age_gt_2_Years', 'Vehicle_Damage_Yes']
+# Fixed schema for the test csv so the pyarrow reader skips type inference ('_id' is never read).
+# Feature columns are floats: a single missing value makes pandas write an int column as '39.0'.
+_TEST_CSV_SCHEMA = {
+    'Gender': pa.string(),
+    'Age': pa.float64(),
+    'Driving_License': pa.float64(),
+    'Region_Code': pa.float64(),
+    'Previously_Insured': pa.float64(),
+    'Vehicle_Age': pa.string(),
+    'Vehicle_Damage': pa.string(),
+    'Annual_Premium': pa.float64(),
+    'Policy_Sales_Channel': pa.float64(),
+    'Vintage': pa.float64(),
+    TARGET_COLUMN: pa.int64(),
+}
+# Bytes parsed per streamed batch; roughly 256k rows of the ingested csv
+_TEST_CSV_BLOCK_SIZE = 16 << 20
+# ioctl request number of Linux FICLONE, used to reflink files on btrfs/XFS
+_FICLONE = 0x40049409
+# Compiled predictor libraries kept on disk; enough for the trained and the best model
+_MAX_COMPILED_MODELS = 4
+# Extension tl2cgen expects for the compiled predictor library on this platform
+_SHARED_LIB_SUFFIX = {'win32': '.dll', 'darwin': '.dylib'}.get(sys.platform, '.so')
+# libyaml-backed emitter when PyYAML was built with it, pure-Python otherwise
+_YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+def _file_digest(file_path: str) -> str:
+    """Return a short blake2b digest of the file's full content, read in 1 MiB blocks."""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _eq_mask(series: pd.Series, value: str) -> np.ndarray:
+    """Compare a string column against a constant (on the Arrow buffer when Arrow-backed); nulls map to False."""
+    return series.eq(value).to_numpy(dtype=bool, na_value=False)
+
+
+def _check_categories(series: pd.Series, allowed: list, allow_null: bool = False) -> None:
+    """Raise ValueError when a categorical column holds values outside allowed (or nulls, unless allowed)."""
+    valid = series.isin(allowed).to_numpy(dtype=bool, na_value=False)
+    if allow_null:
+        valid |= series.isna().to_numpy(dtype=bool)
+    if not valid.all():
+        raise ValueError(f"Unexpected '{series.name}' values: {series[~valid].unique()[:5].tolist()}")
+
+
+def _confusion_counts(actual: np.ndarray, y_hat) -> np.ndarray:
+    """Return [tp, fp, fn, tn] from the boolean positive-label mask and the binary predictions."""
+    predicted = np.asarray(y_hat) == 1
+    tp = int(np.count_nonzero(predicted & actual))
+    fp = int(np.count_nonzero(predicted)) - tp
+    fn = int(np.count_nonzero(actual)) - tp
+    tn = int(actual.size) - tp - fp - fn
+    return np.array([tp, fp, fn, tn], dtype=np.int64)
+
+
+def _metrics_from_counts(counts: np.ndarray) -> Tuple[float, float, float, float]:
+    """Derive (f1, precision, recall, accuracy) from confusion counts; 0.0 on zero division like sklearn."""
+    tp, fp, fn, tn = (int(c) for c in counts)
+    n = tp + fp + fn + tn
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * tp / (2 * tp + fp + fn) if tp else 0.0
+    accuracy = (tp + tn) / n if n else 0.0
+    return f1, precision, recall, accuracy
+
+
+def _reflink(src_path: str, dest_path: str) -> bool:
+    """Clone src into a new dest file sharing its extents; False when the platform/filesystem can't."""
+    if fcntl is None:
+        return False
+    with open(src_path, 'rb') as src, open(dest_path, 'wb') as dest:
+        try:
+            fcntl.ioctl(dest.fileno(), _FICLONE, src.fileno())
+            return True
+        except OSError:
+            pass
+    os.remove(dest_path)
+    return False
+
+
+@functools.lru_cache(maxsize=4)
+def _load_object_cached(path: str, mtime_ns: int, size: int) -> object:
+    """Deserialize a model once per (path, mtime_ns, size); a rewritten file gets a new key."""
+    logging.info(f"Loading model from {path}")
+    return load_object(path)
+
+
+def _tree_ensemble_parts(model: object) -> Optional[Tuple[object, object]]:
+    """Split a MyModel into (preprocessing, forest) when it wraps a fitted tree ensemble."""
+    preprocessing = getattr(model, 'preprocessing_object', None)
+    forest = getattr(model, 'trained_model_object', None)
+    if preprocessing is None or not hasattr(forest, 'estimators_'):
+        return None
+    return preprocessing, forest
+
+
+def _labels_from_scores(classes: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """Map per-row class scores (one column for the positive class, or one per class) to labels."""
+    scores = np.asarray(scores)
+    scores = scores.reshape(scores.shape[0], -1)
+    if scores.shape[1] > 1:
+        return classes.take(scores.argmax(axis=1))
+    return classes.take((scores[:, 0] > 0.5).astype(np.intp))
+
+
+@functools.lru_cache(maxsize=4)
+def _gpu_tree_predictor(path: str, mtime_ns: int, size: int) -> Optional[Callable]:
+    """
+    Convert the tree ensemble inside a MyModel to a GEMM-based TorchScript model with Hummingbird
+    and run it on CUDA. Returns None without torch/hummingbird, without a GPU or for other models.
+    """
+    if hb_convert is None or not torch.cuda.is_available():
+        return None
+    parts = _tree_ensemble_parts(_load_object_cached(path, mtime_ns, size))
+    if parts is None:
+        return None
+    preprocessing, forest = parts
+    try:
+        logging.info(f"Converting tree ensemble from {path} for GPU inference")
+        hb_model = hb_convert(forest, 'pytorch', extra_config={'tree_implementation': 'gemm'}).to('cuda')
+    except Exception as e:
+        logging.warning(f"Could not convert {path} for GPU inference: {e}")
+        return None
+    classes = forest.classes_
+
+    def predict(x: pd.DataFrame) -> np.ndarray:
+        features = np.ascontiguousarray(preprocessing.transform(x), dtype=np.float32)
+        return _labels_from_scores(classes, hb_model.predict_proba(features))
+
+    return predict
+
+
+def _prune_compiled_models(lib_dir: str) -> None:
+    """Delete all but the _MAX_COMPILED_MODELS most recently used libraries in lib_dir."""
+    libs = [os.path.join(lib_dir, f) for f in os.listdir(lib_dir)
+            if f.endswith(_SHARED_LIB_SUFFIX) and '.tmp' not in f]
+    libs.sort(key=os.path.getmtime, reverse=True)
+    for stale in libs[_MAX_COMPILED_MODELS:]:
+        logging.info(f"Removing stale compiled predictor {stale}")
+        os.remove(stale)
+
+
+@functools.lru_cache(maxsize=4)
+def _compiled_tree_predictor(path: str, mtime_ns: int, size: int, lib_dir: str) -> Optional[Callable]:
+    """
+    Compile the tree ensemble inside a MyModel into a native library with treelite/tl2cgen.
+    The library is kept in lib_dir keyed on the model file's content digest so re-evaluations reuse
+    it; only the _MAX_COMPILED_MODELS most recently used libraries are kept.
+    Returns None when the libraries are missing or the model is not a supported tree ensemble.
+    """
+    if tl2cgen is None:
+        return None
+    parts = _tree_ensemble_parts(_load_object_cached(path, mtime_ns, size))
+    if parts is None:
+        return None
+    preprocessing, forest = parts
+
+    # Keyed on content: each run trains into a new timestamped path, but a promoted best model
+    # is a byte copy of an earlier trained model and so reuses that model's library
+    key = _file_digest(path)
+    lib_path = os.path.join(lib_dir, f"{key}{_SHARED_LIB_SUFFIX}")
+    try:
+        if os.path.exists(lib_path):
+            os.utime(lib_path)
+        else:
+            logging.info(f"Compiling tree predictor for {path} into {lib_path}")
+            os.makedirs(lib_dir, exist_ok=True)
+            tmp_path = os.path.join(lib_dir, f"{key}.{os.getpid()}.tmp{_SHARED_LIB_SUFFIX}")
+            tl2cgen.export_lib(treelite.sklearn.import_model(forest), toolchain='gcc', libpath=tmp_path,
+                               params={'parallel_comp': os.cpu_count() or 1})
+            os.replace(tmp_path, lib_path)
+            _prune_compiled_models(lib_dir)
+        predictor = tl2cgen.Predictor(lib_path)
+    except Exception as e:
+        logging.warning(f"Could not compile tree predictor for {path}, using sklearn predict: {e}")
+        return None
+    classes = forest.classes_
+
+    def predict(x: pd.DataFrame) -> np.ndarray:
+        features = np.ascontiguousarray(preprocessing.transform(x), dtype=np.float32)
+        return _labels_from_scores(classes, predictor.predict(tl2cgen.DMatrix(features, dtype='float32')))
+
+    return predict
+
+
+def _predictor_for(path: str, lib_dir: str,
+                   st: Optional[os.stat_result] = None) -> Callable[[pd.DataFrame], np.ndarray]:
+    """
+    Return the fastest available predict function for the model stored at path: GPU, compiled,
+    sklearn. Every tree-ensemble path scales in float64 and casts only the scaled block to float32.
+    st, when the caller already has it, saves another stat of path.
+    """
+    if st is None:
+        st = os.stat(path)
+    predict = (_gpu_tree_predictor(path, st.st_mtime_ns, st.st_size)
+               or _compiled_tree_predictor(path, st.st_mtime_ns, st.st_size, lib_dir))
+    if predict is not None:
+        return predict
+    model = _load_object_cached(path, st.st_mtime_ns, st.st_size)
+    parts = _tree_ensemble_parts(model)
+    if parts is None:
+        return model.predict
+    preprocessing, forest = parts
+
+    def predict(x: pd.DataFrame) -> np.ndarray:
+        return forest.predict(np.ascontiguousarray(preprocessing.transform(x), dtype=np.float32))
+
+    return predict
+
+
 class ModelEvaluation:
     def __init__(self, model_eval_config: ModelEvaluationConfig, 
                  data_ingestion_artifact: DataIngestionArtifact,
@@ -41,13 +287,21 @@ class ModelEvaluation:
         except Exception as e:
             raise MyException(e, sys) from e
 
+    def _best_model_stat(self) -> Optional[os.stat_result]:
+        """Stat the best model file once; None when it is missing or empty."""
+        try:
+            st = os.stat(self.model_eval_config.best_model_path)
+        except FileNotFoundError:
+            return None
+        return st if st.st_size > 0 else None
+
     def get_best_model(self) -> Optional[object]:
         """Load best model from local storage"""
         try:
-            best_model_path = self.model_eval_config.best_model_path
-            if os.path.exists(best_model_path) and os.path.getsize(best_model_path) > 0:
-                return load_object(best_model_path)
-            return None
+            st = self._best_model_stat()
+            if st is None:
+                return None
+            return _load_object_cached(self.model_eval_config.best_model_path, st.st_mtime_ns, st.st_size)
         except Exception as e:
             raise MyException(e, sys)
 
@@ -56,75 +310,111 @@ class ModelEvaluation:
         report_path = self.model_eval_config.report_path
         os.makedirs(os.path.dirname(report_path), exist_ok=True)
         with open(report_path, 'w') as f:
-            yaml.dump(report, f)
+            yaml.dump(report, f, Dumper=_YAML_DUMPER)
         logging.info(f"Evaluation report saved to {report_path}")
 
-    
-    def _map_gender_column(self, df):
-        """Map Gender column to 0 for Female and 1 for Male."""
-        logging.info("Mapping 'Gender' column to binary values")
-        df['Gender'] = df['Gender'].map({'Female': 0, 'Male': 1}).astype(int)
-        return df
-
-    def _create_dummy_columns(self, df):
-        """Create dummy variables for categorical features."""
-        logging.info("Creating dummy variables for categorical features")
-        df = pd.get_dummies(df, drop_first=True)
-        return df
-
-    def _rename_columns(self, df):
-        """Rename specific columns and ensure integer types for dummy columns."""
-        logging.info("Renaming specific columns and casting to int")
-        df = df.rename(columns={
-            "Vehicle_Age_< 1 Year": "Vehicle_Age_lt_1_Year",
-            "Vehicle_Age_> 2 Years": "Vehicle_Age_gt_2_Years"
-        })
-        for col in ["Vehicle_Age_lt_1_Year", "Vehicle_Age_gt_2_Years", "Vehicle_Damage_Yes"]:
-            if col in df.columns:
-                df[col] = df[col].astype('int')
-        return df
-    
-    def _drop_id_column(self, df):
-        """Drop the 'id' column if it exists."""
-        logging.info("Dropping 'id' column")
-        if "_id" in df.columns:
-            df = df.drop("_id", axis=1)
-        return df
+    def _promote_model(self, src_path: str, dest_path: str) -> None:
+        """
+        Swap the accepted model into dest_path atomically without rewriting its bytes when the
+        filesystem allows it: reflink (copy-on-write clone), otherwise a plain copy. No hardlink:
+        the trained-model path is rewritten in place by later runs in the same process, which
+        would silently change the best model through the shared inode.
+        """
+        tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if not _reflink(src_path, tmp_path):
+                shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _iter_test_batches(self) -> Iterator[pd.DataFrame]:
+        """Stream the test csv through the multithreaded pyarrow reader as Arrow-backed batches."""
+        reader = pa_csv.open_csv(
+            self.data_ingestion_artifact.test_file_path,
+            read_options=pa_csv.ReadOptions(block_size=_TEST_CSV_BLOCK_SIZE),
+            convert_options=pa_csv.ConvertOptions(column_types=_TEST_CSV_SCHEMA,
+                                                  include_columns=list(_TEST_CSV_SCHEMA)),
+        )
+        for batch in reader:
+            if batch.num_rows:
+                yield batch.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def _iter_feature_batches(self) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+        """Yield (features, int8 target) batches prepared from the streamed test csv."""
+        for test_df in self._iter_test_batches():
+            yield self._prepare_features(test_df), test_df[TARGET_COLUMN].to_numpy(dtype=np.int8)
+
+    def _prepare_features(self, test_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Build the model input in one pass: map Gender, create the Vehicle_Age/Vehicle_Damage
+        dummies and stack every feature into a single contiguous float64 block in training column
+        order. '_id' and the target are excluded simply by not being selected. The block stays
+        float64 because MyModel's scalers were fit in float64; only their output is cast to the
+        float32 the tree ensemble uses (see _predictor_for).
+        """
+        logging.info("Preparing feature matrix for prediction")
+        # Unknown values would otherwise be scored as Female / the dropped reference category.
+        # Null Vehicle_Age/Vehicle_Damage give all-zero dummies, as get_dummies did at training time.
+        gender = test_df['Gender']
+        _check_categories(gender, ['Female', 'Male'])
+        _check_categories(test_df['Vehicle_Age'], ['1-2 Year', '< 1 Year', '> 2 Years'], allow_null=True)
+        _check_categories(test_df['Vehicle_Damage'], ['No', 'Yes'], allow_null=True)
+        features = np.column_stack([
+            _eq_mask(gender, 'Male'),
+            *(test_df[col].to_numpy(dtype=np.float64, na_value=np.nan) for col in _PASSTHROUGH_FEATURES),
+            _eq_mask(test_df['Vehicle_Age'], '< 1 Year'),
+            _eq_mask(test_df['Vehicle_Age'], '> 2 Years'),
+            _eq_mask(test_df['Vehicle_Damage'], 'Yes'),
+        ]).astype(np.float64, copy=False)
+        # The preprocessing step of MyModel selects columns by name, so keep the labels
+        return pd.DataFrame(features, columns=_FEATURE_COLUMNS, copy=False)
 
     def evaluate_model(self) -> EvaluateModelResponse:
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
-            x, y = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
+            # Resolve predict functions for the current trained model and the best model, if any
+            lib_dir = self.model_eval_config.compiled_model_dir
+            trained_predict = _predictor_for(self.model_trainer_artifact.trained_model_file_path, lib_dir)
+            best_model_stat = self._best_model_stat()
+            best_predict = None
+            if best_model_stat is not None:
+                best_predict = _predictor_for(self.model_eval_config.best_model_path, lib_dir, best_model_stat)
+
+            # Score batch by batch, accumulating confusion counts so only one batch is resident
+            trained_counts = np.zeros(4, dtype=np.int64)
+            best_counts = np.zeros(4, dtype=np.int64)
+            # Both predictors release the GIL in their native loops, so run them side by side.
+            # The features were just built from a fixed schema, so skip sklearn's NaN/inf scan and
+            # parameter validation; sklearn's Parallel/delayed carry this config into the workers.
+            with sklearn.config_context(assume_finite=True, skip_parameter_validation=True), \
+                    Parallel(n_jobs=2, backend='threading') as parallel:
+                for x, y in self._iter_feature_batches():
+                    # Binarize the int8 target once per batch and share it between both models
+                    actual = np.asarray(y) == 1
+                    if best_predict is None:
+                        trained_counts += _confusion_counts(actual, trained_predict(x))
+                        continue
+                    y_hat_train, y_hat_best = parallel(
+                        delayed(predict)(x) for predict in (trained_predict, best_predict)
+                    )
+                    trained_counts += _confusion_counts(actual, y_hat_train)
+                    best_counts += _confusion_counts(actual, y_hat_best)
+            logging.info(f"Scored {int(trained_counts.sum())} test rows")
 
-            # Apply data transformations
-            x = self._map_gender_column(x)
-            x = self._drop_id_column(x)
-            x = self._create_dummy_columns(x)
-            x = self._rename_columns(x)
-
-            # Load current trained model
-            trained_model = load_object(self.model_trainer_artifact.trained_model_file_path)
-            
             # Calculate metrics for trained model
-            y_hat_train = trained_model.predict(x)
-            trained_f1 = f1_score(y, y_hat_train)
-            trained_precision = precision_score(y, y_hat_train)
-            trained_recall = recall_score(y, y_hat_train)
-            trained_accuracy = accuracy_score(y, y_hat_train)
+            trained_f1, trained_precision, trained_recall, trained_accuracy = \
+                _metrics_from_counts(trained_counts)
 
             # Initialize best model metrics
-            best_model = self.get_best_model()
-            best_f1 = 0.4358042535618418
-            best_precision = 0.2874067214989923
-            best_recall = 0.9010416666666666
-            best_accuracy = 0.7132181615902937
-
-            if best_model is not None:
-                y_hat_best = best_model.predict(x)
-                best_f1 = f1_score(y, y_hat_best)
-                best_precision = precision_score(y, y_hat_best)
-                best_recall = recall_score(y, y_hat_best)
-                best_accuracy = accuracy_score(y, y_hat_best)
+            best_f1, best_precision, best_recall, best_accuracy = _DEFAULT_BEST_METRICS
+
+            if best_predict is not None:
+                best_f1, best_precision, best_recall, best_accuracy = \
+                    _metrics_from_counts(best_counts)
 
             improvement = trained_f1 - best_f1
             is_accepted = improvement > 0
@@ -172,27 +462,7 @@ class ModelEvaluation:
             if eval_response.is_model_accepted:
                 src_path = self.model_trainer_artifact.trained_model_file_path
                 dest_path = self.model_eval_config.best_model_path
-                shutil.copy(src_path, dest_path)
-                logging.info(f"New best model saved to {dest_path}")
-
-            return ModelEvaluationArtifact(
-                is_model_accepted=eval_response.is_model_accepted,
-                report_path=self.model_eval_config.report_path,
-                best_model_path=self.model_eval_config.best_model_path,
-                trained_model_path=self.model_trainer_artifact.trained_model_file_path
-            )
-        except Exception as e:
-            raise MyException(e, sys)
-
-    def initiate_model_evaluation(self) -> ModelEvaluationArtifact:
-        try:
-            eval_response = self.evaluate_model()
-
-            # Promote current model to best if accepted
-            if eval_response.is_model_accepted:
-                src_path = self.model_trainer_artifact.trained_model_file_path
-                dest_path = self.model_eval_config.best_model_path
-                shutil.copy(src_path, dest_path)
+                self._promote_model(src_path, dest_path)
                 logging.info(f"New best model saved to {dest_path}")
 
             return ModelEvaluationArtifact(
@@ -72,6 +72,7 @@ MODEL Evaluation related constants
 
 MODEL_EVALUATION_DIR_NAME: str = "model_evaluation"          # This is for local file system
 MODEL_EVALUATION_REPORT_NAME: str = "eval_report.yaml"       # This is for local file system
+MODEL_EVALUATION_COMPILED_MODEL_DIR: str = os.path.join(ARTIFACT_DIR, "compiled_models")  # keyed on model content
 
 
 
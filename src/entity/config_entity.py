@@ -69,6 +69,7 @@ class ModelEvaluationConfig:
     report_path: str = os.path.join(training_pipeline_config.artifact_dir, 
                                   MODEL_EVALUATION_DIR_NAME, 
                                   MODEL_EVALUATION_REPORT_NAME)
+    compiled_model_dir: str = MODEL_EVALUATION_COMPILED_MODEL_DIR
 
 
 # @dataclass